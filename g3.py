@@ -1,9 +1,8 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-import altair as alt
-import math
+import plotly.graph_objects as go
+import pyarrow as pa
 
 # Set page config
 st.set_page_config(
@@ -37,17 +36,73 @@ st.write("Select foods and quantities to see their nutritional content and envir
 # Load data
 @st.cache_data
 def load_data():
-    df = pd.read_csv("Combined Data on Food.csv")
+    csv_num_cols = [
+        "Carbohydrates (g)",
+        "Fats (g)",
+        "Proteins (g)",
+        "food_emissions_land_use",
+        "food_emissions_farm",
+        "food_emissions_animal_feed",
+        "food_emissions_processing",
+        "food_emissions_transport",
+        "food_emissions_retail",
+        "food_emissions_packaging",
+        "food_emissions_losses"
+    ]
+    # Read the numeric columns as float32 up front: the nutrition/emission
+    # values are small, and half-width floats halve the frame's memory and
+    # the bandwidth of the aggregation matmul
+    df = pd.read_csv(
+        "Combined Data on Food.csv",
+        dtype={col: np.float32 for col in csv_num_cols}
+    )
     # Original data is per kilogram, but we'll keep it as is
     # We'll do the conversion when calculating totals based on user-selected ounces
-    
+
+    # Categorical entities compare as small-int codes rather than Python
+    # strings, and indexing the frame by them makes df.loc[food] a hash
+    # lookup instead of a column scan (drop=False keeps the Entity column
+    # for the details table)
+    df["Entity"] = df["Entity"].astype("category")
+    df = df.set_index("Entity", drop=False)
+
     # Add a calorie column based on macronutrients
     # 4 calories per gram of carbs, 4 calories per gram of protein, 9 calories per gram of fat
     df['Calories'] = df['Carbohydrates (g)'] * 4 + df['Proteins (g)'] * 4 + df['Fats (g)'] * 9
-    
-    return df
 
-df = load_data()
+    # Calories joins the aggregation matrix so the single weighted reduction
+    # covers it too instead of a separate per-rerun recompute
+    num_cols = csv_num_cols[:3] + ["Calories"] + csv_num_cols[3:]
+
+    # The numeric matrix for the vectorized aggregation (one row per food);
+    # already float32, so this is a cheap column gather
+    entity_to_idx = {entity: i for i, entity in enumerate(df["Entity"].values)}
+    M = df[num_cols].to_numpy(dtype=np.float32)
+
+    # Pre-materialize each food's row as a plain dict so lookups are O(1)
+    # hash hits with no per-rerun Series allocation or to_dict conversion
+    entity_rows = {row["Entity"]: row.to_dict() for _, row in df.iterrows()}
+
+    # The categorical's categories are already lexicographically sorted, so
+    # the food list is a straight copy; a tuple so the cached value stays
+    # immutable
+    food_items = tuple(df["Entity"].cat.categories)
+
+    # Selection grid backing the data editor: one widget for the whole food
+    # list instead of one checkbox + slider per food
+    food_grid = pd.DataFrame({
+        "Food": food_items,
+        "Selected": False,
+        "Qty (oz)": 1.0
+    })
+
+    return df, entity_to_idx, M, num_cols, entity_rows, food_items, food_grid
+
+df, entity_to_idx, M, NUM_COLS, entity_rows, food_items, food_grid = load_data()
+
+# 1 oz = 0.0283495 kg; shared by the scalar converter and the vectorized
+# quantity calculations
+OZ_TO_KG = 0.0283495
 
 # Function to convert kg to oz and vice versa
 def kg_to_oz(kg_value):
@@ -55,159 +110,201 @@ def kg_to_oz(kg_value):
     return kg_value / 35.274
 
 def oz_to_kg(oz_value):
-    # 1 oz = 0.0283495 kg
-    return oz_value * 0.0283495
+    return oz_value * OZ_TO_KG
+
+# Aggregate the selected rows of M weighted by the kg quantities. With numba
+# installed this runs as native code (compiled once at import thanks to the
+# explicit signature, and cached on disk so restarts skip the JIT); without
+# it we fall back to the equivalent NumPy dot product.
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+if njit is not None:
+    @njit("float32[:](int32[:], float32[:], float32[:,:])", cache=True)
+    def aggregate_rows(idx, qty_kg, M):
+        out = np.zeros(M.shape[1], dtype=np.float32)
+        for i in range(idx.size):
+            row = M[idx[i]]
+            q = qty_kg[i]
+            for j in range(out.size):
+                out[j] += row[j] * q
+        return out
+else:
+    def aggregate_rows(idx, qty_kg, M):
+        # einsum lets NumPy pick a plain C loop for the tiny row counts a
+        # user actually selects, avoiding BLAS thread startup on each rerun
+        return np.einsum('i,ij->j', qty_kg, M[idx])
+
+# The aggregate is a pure function of the selection, so memoize it on the
+# (sorted) selection items: toggling back to a previously seen state serves
+# the vector straight from cache
+@st.cache_data
+def compute_agg(items):
+    idx = np.fromiter((entity_to_idx[food] for food, _ in items), dtype=np.int32)
+    # Convert the user-selected ounces to kg in one vectorized multiply
+    qty_kg = np.fromiter((qty for _, qty in items), dtype=np.float32) * np.float32(OZ_TO_KG)
+    return aggregate_rows(idx, qty_kg, M)
+
+# Static chart pieces, hoisted so a chart build (on a cache miss) only has
+# to fill in the trace values
+NUTRITION_CATEGORIES = ("Carbohydrates", "Proteins", "Fats")
+NUTRITION_COLORS = ('#3498db', '#2ecc71', '#e74c3c')
+NUTRITION_LAYOUT = dict(
+    title=dict(text="Nutritional Content (g)", font=dict(size=15)),
+    showlegend=False,
+    height=450
+)
+EMISSIONS_CATEGORIES = (
+    "Land Use", "Farm", "Animal Feed", "Processing",
+    "Transport", "Retail", "Packaging", "Losses"
+)
+EMISSIONS_KEYS = (
+    "food_emissions_land_use",
+    "food_emissions_farm",
+    "food_emissions_animal_feed",
+    "food_emissions_processing",
+    "food_emissions_transport",
+    "food_emissions_retail",
+    "food_emissions_packaging",
+    "food_emissions_losses"
+)
+EMISSIONS_MARKER = dict(color=tuple(range(len(EMISSIONS_CATEGORIES))), colorscale='Viridis')
+EMISSIONS_LAYOUT = dict(
+    title="Emissions by Category",
+    xaxis_title="Emissions (kg CO₂ eq)",
+    yaxis=dict(autorange="reversed"),
+    height=450
+)
 
-# Function to create the nutrition chart using Matplotlib
+# Column lists for the details-table totals; all static, so built once here
+# instead of rescanning the frame's columns on every rerun
+NUTRIENT_COLS = ("Carbohydrates (g)", "Proteins (g)", "Fats (g)", "Calories")
+TOTAL_COL_NAMES = tuple(f"Total {col}" for col in NUTRIENT_COLS) + tuple(
+    f"Total Emissions {col.replace('food_emissions_', '')} (kg CO₂)"
+    for col in EMISSIONS_KEYS
+)
+
+# Function to create the nutrition chart using Plotly; memoized so identical
+# aggregates reuse the serialized figure
+@st.cache_data
 def create_nutrition_chart(data):
-    # Create a figure and axis
-    fig, ax = plt.subplots(figsize=(6, 6), subplot_kw=dict(polar=True))
-    
-    # Categories and values
-    categories = ["Carbohydrates", "Proteins", "Fats"]
     values = [data["Carbohydrates (g)"], data["Proteins (g)"], data["Fats (g)"]]
-    
-    # Number of categories
-    N = len(categories)
-    
-    # Compute the angle for each category
-    angles = [n / float(N) * 2 * np.pi for n in range(N)]
-    angles += angles[:1]  # Close the loop
-    
-    # Add the values to the plot
-    ax.bar(
-        angles[:-1], 
-        values, 
-        width=0.5, 
-        alpha=0.8, 
-        color=['#3498db', '#2ecc71', '#e74c3c']
-    )
-    
-    # Set the labels
-    plt.xticks(angles[:-1], categories)
-    
-    # Add a title
-    plt.title("Nutritional Content (g)", size=15)
-    
-    # Adjust the layout
-    plt.tight_layout()
-    
+
+    # Polar bar chart; Plotly only re-serializes the trace data on update,
+    # so there is no per-rerun figure/backend allocation like matplotlib
+    fig = go.Figure(go.Barpolar(
+        r=values,
+        theta=NUTRITION_CATEGORIES,
+        width=60,
+        opacity=0.8,
+        marker_color=NUTRITION_COLORS
+    ))
+
+    fig.update_layout(**NUTRITION_LAYOUT)
+
     return fig
 
-# Function to create the emissions chart using Matplotlib
+# Function to create the emissions chart using Plotly; memoized like the
+# nutrition chart
+@st.cache_data
 def create_emissions_chart(data):
-    # Create a figure and axis
-    fig, ax = plt.subplots(figsize=(8, 6))
-    
-    # Categories and values
-    categories = [
-        "Land Use", "Farm", "Animal Feed", "Processing", 
-        "Transport", "Retail", "Packaging", "Losses"
-    ]
-    values = [
-        data["food_emissions_land_use"], 
-        data["food_emissions_farm"],
-        data["food_emissions_animal_feed"], 
-        data["food_emissions_processing"],
-        data["food_emissions_transport"], 
-        data["food_emissions_retail"],
-        data["food_emissions_packaging"], 
-        data["food_emissions_losses"]
-    ]
-    
-    # Create a bar chart
-    colors = plt.cm.viridis(np.linspace(0, 1, len(categories)))
-    bars = ax.barh(categories, values, color=colors, alpha=0.8)
-    
-    # Add labels and title
-    ax.set_xlabel("Emissions (kg CO₂ eq)")
-    ax.set_title("Emissions by Category")
-    
-    # Add values to the bars
-    for bar in bars:
-        width = bar.get_width()
-        label_x_pos = width if width > 0 else 0
-        ax.text(label_x_pos, bar.get_y() + bar.get_height()/2, f'{width:.3f}', 
-                va='center', ha='left', fontsize=8)
-    
-    # Adjust the layout
-    plt.tight_layout()
-    
+    values = [data[key] for key in EMISSIONS_KEYS]
+
+    # Horizontal bar chart with a viridis color spread and value labels
+    fig = go.Figure(go.Bar(
+        x=values,
+        y=EMISSIONS_CATEGORIES,
+        orientation='h',
+        opacity=0.8,
+        marker=EMISSIONS_MARKER,
+        text=[f'{v:.3f}' for v in values],
+        textposition='outside',
+        textfont=dict(size=8)
+    ))
+
+    fig.update_layout(**EMISSIONS_LAYOUT)
+
     return fig
 
-# Main app layout
+# Main app layout. The selection UI and the charts/tables run as separate
+# fragments so a widget interaction in one does not rebuild the other; the
+# selection fragment publishes its state through st.session_state and asks
+# for a full rerun only when the selection actually changed.
 col1, col2 = st.columns([1, 2])
 
-with col1:
+st.session_state.setdefault("selection_state", ({}, 700))
+
+@st.fragment
+def food_selection():
     st.header("Food Selection")
-    
+
     # Add calorie target option
     st.subheader("Calorie Target")
     calorie_target = st.number_input("Target Calories", min_value=100, max_value=2000, value=700, step=50)
     st.write(f"Targeting approximately {calorie_target} calories")
-    
-    # Sort the food items alphabetically
-    food_items = sorted(df["Entity"].unique())
-    
-    # Create three columns for food selection checkboxes
-    col_count = 3
-    rows = math.ceil(len(food_items) / col_count)
-    food_cols = st.columns(col_count)
-    
-    # Dictionary to store selected foods and their quantities
-    selected_foods = {}
-    
-    # Display food items in columns
-    for i, food in enumerate(food_items):
-        col_idx = i % col_count
-        with food_cols[col_idx]:
-            if st.checkbox(food, key=f"check_{food}"):
-                selected_foods[food] = 1  # Default to 1 oz
-    
-    # Show quantity sliders for selected foods
-    if selected_foods:
-        st.subheader("Set Quantities (oz)")
-        for food in selected_foods:
-            selected_foods[food] = st.slider(
-                f"{food}", 
-                min_value=0.5, 
-                max_value=16.0, 
-                value=1.0, 
-                step=0.5,
-                key=f"qty_{food}"
+
+    # One data editor for the whole food list: a single widget round-trip
+    # per interaction instead of one checkbox and slider per food
+    edited = st.data_editor(
+        food_grid,
+        hide_index=True,
+        key="food_grid",
+        column_config={
+            "Food": st.column_config.TextColumn(disabled=True),
+            "Selected": st.column_config.CheckboxColumn(),
+            "Qty (oz)": st.column_config.NumberColumn(
+                min_value=0.5, max_value=16.0, step=0.5, required=True, default=1.0
             )
-    
+        }
+    )
+
+    # Dictionary of selected foods and their quantities. A cleared quantity
+    # cell still reads back as NaN until the user commits a value, so drop
+    # those rows rather than letting NaN into the selection
+    selected = edited.loc[edited["Selected"] & edited["Qty (oz)"].notna()]
+    selected_foods = dict(zip(selected["Food"], selected["Qty (oz)"]))
+
+    if selected_foods:
         # Display total selected items
         st.info(f"📊 {len(selected_foods)} foods selected")
     else:
         st.warning("Please select at least one food item.")
 
-with col2:
+    # Publish the selection for the output fragment; rerun the whole app
+    # only when it actually changed. Normalize to plain finite floats first:
+    # a NaN would compare unequal to itself and re-fire the rerun forever.
+    published = (
+        {food: float(qty) for food, qty in selected_foods.items() if np.isfinite(qty)},
+        calorie_target
+    )
+    if st.session_state["selection_state"] != published:
+        st.session_state["selection_state"] = published
+        st.rerun(scope="app")
+
+@st.fragment
+def render_output():
+    selected_foods, calorie_target = st.session_state["selection_state"]
+
     # Only show charts if foods are selected
     if selected_foods:
-        # Calculate aggregate nutritional and emissions data
-        agg_data = {
-            "Carbohydrates (g)": 0,
-            "Fats (g)": 0,
-            "Proteins (g)": 0,
-            "Calories": 0,
-            "food_emissions_land_use": 0,
-            "food_emissions_farm": 0,
-            "food_emissions_animal_feed": 0,
-            "food_emissions_processing": 0,
-            "food_emissions_transport": 0,
-            "food_emissions_retail": 0,
-            "food_emissions_packaging": 0,
-            "food_emissions_losses": 0
-        }
-        
-        # Calculate totals
-        for food, qty_oz in selected_foods.items():
-            food_data = df[df["Entity"] == food].iloc[0]
-            # Convert the user-selected ounces to kg before multiplying with per-kg values
-            qty_kg = oz_to_kg(qty_oz)
-            for key in agg_data:
-                agg_data[key] += food_data[key] * qty_kg
+        # Calculate aggregate nutritional and emissions data; memoized on the
+        # selection so reverting to a previous state skips the computation
+        agg = compute_agg(tuple(sorted(selected_foods.items())))
+
+        # Calories rides along in the matrix, so the dict covers every key
+        agg_data = dict(zip(NUM_COLS, agg.tolist()))
+
+        # Vectorized rounding for the summary tables: one np.round pass per
+        # slice instead of a dozen builtins.round calls. Widen to float64
+        # first — decimals like 22.4 are not representable in float32, and
+        # the tables would otherwise display 22.399999618530273
+        nutri = agg[:3].astype(np.float64)   # carbs, fats, proteins
+        emis = agg[4:].astype(np.float64)    # emissions, in EMISSIONS_KEYS order
+        nutri_r = np.round(nutri, 1).tolist()
+        nutri_cal_r = np.round(nutri * np.array([4.0, 9.0, 4.0]), 1).tolist()
+        emis_r = np.round(emis, 3).tolist()
         
         # Display calorie progress
         total_calories = round(agg_data["Calories"])
@@ -231,21 +328,19 @@ with col2:
         with chart_col1:
             st.subheader("Nutritional Content")
             nutrition_chart = create_nutrition_chart(agg_data)
-            st.pyplot(nutrition_chart)
+            st.plotly_chart(nutrition_chart, width="stretch")
             
             # Show nutritional summary
             st.write("### Nutritional Summary")
-            carbs_cal = round(agg_data["Carbohydrates (g)"] * 4, 1)
-            protein_cal = round(agg_data["Proteins (g)"] * 4, 1)
-            fat_cal = round(agg_data["Fats (g)"] * 9, 1)
-            
+            carbs_cal, fat_cal, protein_cal = nutri_cal_r
+
             summary_data = {
                 "Nutrient": ["Carbohydrates", "Proteins", "Fats", "Total"],
                 "Amount (g)": [
-                    round(agg_data["Carbohydrates (g)"], 1),
-                    round(agg_data["Proteins (g)"], 1),
-                    round(agg_data["Fats (g)"], 1),
-                    round(agg_data["Carbohydrates (g)"] + agg_data["Proteins (g)"] + agg_data["Fats (g)"], 1)
+                    nutri_r[0],
+                    nutri_r[2],
+                    nutri_r[1],
+                    round(float(nutri.sum()), 1)
                 ],
                 "Calories": [
                     carbs_cal,
@@ -260,12 +355,14 @@ with col2:
                     "100%"
                 ]
             }
-            st.dataframe(pd.DataFrame(summary_data), hide_index=True)
+            # Streamlit serializes tables to Arrow anyway, so hand it an
+            # Arrow table directly and skip the pandas BlockManager round trip
+            st.dataframe(pa.table(summary_data), hide_index=True)
         
         with chart_col2:
             st.subheader("Emissions Impact")
             emissions_chart = create_emissions_chart(agg_data)
-            st.pyplot(emissions_chart)
+            st.plotly_chart(emissions_chart, width="stretch")
             
             # Show emissions summary
             st.write("### Emissions Summary")
@@ -274,54 +371,49 @@ with col2:
                     "Land Use", "Farm", "Animal Feed", "Processing", 
                     "Transport", "Retail", "Packaging", "Losses", "Total"
                 ],
-                "CO₂ eq (kg)": [
-                    round(agg_data["food_emissions_land_use"], 3),
-                    round(agg_data["food_emissions_farm"], 3),
-                    round(agg_data["food_emissions_animal_feed"], 3),
-                    round(agg_data["food_emissions_processing"], 3),
-                    round(agg_data["food_emissions_transport"], 3),
-                    round(agg_data["food_emissions_retail"], 3),
-                    round(agg_data["food_emissions_packaging"], 3),
-                    round(agg_data["food_emissions_losses"], 3),
-                    round(sum([agg_data[k] for k in agg_data if k.startswith("food_emissions")]), 3)
-                ]
+                "CO₂ eq (kg)": emis_r + [round(float(emis.sum()), 3)]
             }
-            st.dataframe(pd.DataFrame(emissions_data), hide_index=True)
-    
+            st.dataframe(pa.table(emissions_data), hide_index=True)
+
+        # Display selected food details in a table
+        st.header("Selected Foods Details")
+
+        # Create a dataframe of selected foods from the cached row dicts,
+        # inserting rows in sorted order so the frame never needs a
+        # sort_values pass
+        selected_data = [
+            dict(entity_rows[food], **{"Quantity (oz)": qty})
+            for food, qty in sorted(selected_foods.items())
+        ]
+        selected_df = pd.DataFrame.from_records(selected_data)
+
+        # Calculate the totals for each item based on quantity in one vectorized
+        # block: a single kg vector, one matrix multiply, and one concat instead
+        # of a per-column apply and column insertion
+        qty_kg = selected_df["Quantity (oz)"].to_numpy() * OZ_TO_KG
+        totals = selected_df[list(NUTRIENT_COLS + EMISSIONS_KEYS)].to_numpy() * qty_kg[:, None]
+        totals_df = pd.DataFrame(totals, columns=list(TOTAL_COL_NAMES), index=selected_df.index)
+        selected_df = pd.concat([selected_df, totals_df], axis=1)
+
+        # Select columns to display
+        display_cols = [
+            "Entity", "Quantity (oz)", "Total Calories",
+            "Total Carbohydrates (g)", "Total Proteins (g)", "Total Fats (g)",
+            "Total Emissions land_use (kg CO₂)", "Total Emissions farm (kg CO₂)",
+            "Total Emissions animal_feed (kg CO₂)", "Total Emissions transport (kg CO₂)"
+        ]
+
+        # Display the table
+        st.dataframe(selected_df[display_cols], hide_index=True)
+
     else:
         st.info("Select foods from the left panel to see nutrition and emissions charts.")
 
-# Display selected food details in a table
-if selected_foods:
-    st.header("Selected Foods Details")
-    
-    # Create a dataframe of selected foods
-    selected_data = []
-    for food, qty in selected_foods.items():
-        food_data = df[df["Entity"] == food].iloc[0].to_dict()
-        food_data["Quantity (oz)"] = qty
-        selected_data.append(food_data)
-    
-    selected_df = pd.DataFrame(selected_data)
-    
-    # Calculate the totals for each item based on quantity
-    for col in ["Carbohydrates (g)", "Proteins (g)", "Fats (g)", "Calories"]:
-        selected_df[f"Total {col}"] = selected_df[col] * selected_df["Quantity (oz)"].apply(oz_to_kg)
-    
-    for col in [c for c in selected_df.columns if c.startswith("food_emissions")]:
-        display_name = col.replace("food_emissions_", "")
-        selected_df[f"Total Emissions {display_name} (kg CO₂)"] = selected_df[col] * selected_df["Quantity (oz)"].apply(oz_to_kg)
-    
-    # Select columns to display
-    display_cols = [
-        "Entity", "Quantity (oz)", "Total Calories",
-        "Total Carbohydrates (g)", "Total Proteins (g)", "Total Fats (g)",
-        "Total Emissions land_use (kg CO₂)", "Total Emissions farm (kg CO₂)",
-        "Total Emissions animal_feed (kg CO₂)", "Total Emissions transport (kg CO₂)"
-    ]
-    
-    # Display the table
-    st.dataframe(selected_df[display_cols].sort_values("Entity"), hide_index=True)
+with col1:
+    food_selection()
+
+with col2:
+    render_output()
 
 # Add some information about the data source and app
 st.markdown("""